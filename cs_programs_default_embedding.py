@@ -8,30 +8,118 @@ CS Programs ChromaDB Query Tool - 使用默认嵌入模型
 日期: 2025-09-16
 """
 
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pv
 import chromadb
 from chromadb.utils import embedding_functions
-import json
 import os
+import csv
+import hashlib
+from collections import OrderedDict
+from ast import literal_eval
+from dataclasses import dataclass
 from pprint import pprint
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterator
+
+# 文档模板只构建一次，预先绑定str.format供逐行调用
+_DOC_TEMPLATE = """项目名称: {program_name}
+所属大学: {university}
+地区: {region}
+项目等级: {tier}
+学制: {duration}
+授课语言: {language}
+学位类型: {degree_type}
+
+项目优点: {pros}
+
+项目缺点: {cons}
+
+招生偏好: {admission_preference}
+
+申请注意事项: {application_notes}
+
+奖学金信息: {scholarship}
+
+过往录取案例: {admission_text}
+
+其他信息: {other_info} {other_notes}""".format
+
+# CSV解析缓存的格式版本：解析逻辑或列类型变化时递增，使旧缓存失效
+_CSV_CACHE_VERSION = 3
+
+# 按数值解析的列；其余列一律按字符串读取，避免类型推断让文本列中的空值变成<NA>
+_NUMERIC_COLUMNS = {'admission_data_count'}
+
+# 低基数列，以字典编码存储以减少内存
+_CATEGORY_COLUMNS = ['region', 'tier', 'duration', 'language', 'degree_type']
+
+# 每个实例缓存的查询嵌入条数上限
+_QUERY_CACHE_SIZE = 512
+
+# HNSW索引参数：余弦距离（与 1-distance 相似度一致），较大的M和construction_ef提高召回，
+# search_ef控制查询时的候选集大小；仅在新建集合时生效
+_HNSW_METADATA = {
+    "hnsw:space": "cosine",
+    "hnsw:M": 32,
+    "hnsw:construction_ef": 200,
+    "hnsw:search_ef": 64,
+}
+
+
+@dataclass
+class QueryResult:
+    """单条查询结果"""
+    __slots__ = ('rank', 'document', 'metadata', 'distance')
+    
+    rank: int
+    document: str
+    metadata: Dict[str, Any]
+    distance: float
+    
+    @property
+    def similarity(self) -> float:
+        return 1 - self.distance
+
+
+def _iter_results(results: Dict[str, Any], query_index: int = 0) -> Iterator[QueryResult]:
+    """按排名逐条产出某个查询的结果（query_index对应批量查询中的第几条查询）"""
+    for rank, (doc, metadata, distance) in enumerate(zip(
+        results['documents'][query_index],
+        results['metadatas'][query_index],
+        results['distances'][query_index]
+    ), start=1):
+        yield QueryResult(rank, doc, metadata, distance)
+
 
 class CSProgramsDB:
     """CS项目数据库查询类"""
     
+    # 固定实例属性，省去每个实例的__dict__；新增属性需同步加入
+    __slots__ = (
+        'db_path', 'collection_prefix', 'collection_name', 'client', 'collection',
+        'embedding_function', 'int8_index', '_query_cache',
+    )
+    
     def __init__(self, db_path: str = "vectors", collection_name: str = "cs_programs_default"):
         """
         初始化数据库连接
         
         Args:
             db_path: 数据库路径
-            collection_name: 集合名称
+            collection_name: 集合名称；调用 use_dataset 后作为前缀，拼接数据哈希
         """
         self.db_path = db_path
+        self.collection_prefix = collection_name
         self.collection_name = collection_name
         self.client = None
         self.collection = None
         self.embedding_function = None
+        self.int8_index = None
+        # 按实例缓存查询文本的嵌入向量（LRU），重复查询无需再次调用模型
+        self._query_cache = OrderedDict()
         
         self._initialize_db()
     
@@ -43,6 +131,7 @@ class CSProgramsDB:
             
             # 使用ChromaDB默认嵌入函数（不需要API）
             self.embedding_function = embedding_functions.DefaultEmbeddingFunction()
+            self._query_cache.clear()
             
             print(f"✅ 成功初始化ChromaDB客户端，数据库路径: {self.db_path}")
             print(f"✅ 使用默认嵌入函数: {type(self.embedding_function).__name__}")
@@ -51,15 +140,75 @@ class CSProgramsDB:
             print(f"❌ 数据库初始化失败: {e}")
             raise
     
+    def _embed_queries(self, query_texts: List[str]) -> List[List[float]]:
+        """
+        获取多条查询文本的嵌入向量，优先使用LRU缓存
+        
+        未命中的文本去重后合并为一次模型调用；缓存超过 _QUERY_CACHE_SIZE 时淘汰最久未用的条目。
+        """
+        misses = [text for text in dict.fromkeys(query_texts) if text not in self._query_cache]
+        if misses:
+            for text, vector in zip(misses, self.embedding_function(misses)):
+                self._query_cache[text] = [float(x) for x in vector]
+        
+        embeddings = []
+        for text in query_texts:
+            self._query_cache.move_to_end(text)
+            embeddings.append(self._query_cache[text])
+        
+        while len(self._query_cache) > _QUERY_CACHE_SIZE:
+            self._query_cache.popitem(last=False)
+        return embeddings
+    
+    def _embed_query(self, query_text: str) -> List[float]:
+        """获取单条查询文本的嵌入向量（经由缓存）"""
+        return self._embed_queries([query_text])[0]
+    
+    def _apply_sqlite_pragmas(self):
+        """
+        为批量导入调整底层SQLite参数
+        
+        WAL + synchronous=NORMAL 在保证崩溃安全的前提下减少每批次的事务开销。
+        不使用 locking_mode=EXCLUSIVE，否则会阻塞其他进程的并发读取。
+        ChromaDB的连接池按线程分配连接，除WAL外的参数只作用于当前连接，
+        因此必须在执行写入的线程上、写入开始前调用。
+        
+        仅对使用Python SQLite后端的ChromaDB（<1.0）生效；1.x的存储层由Rust实现，
+        不暴露可调整的连接，此时直接跳过。依赖内部接口，其他不兼容情况同样跳过。
+        """
+        pragmas = [
+            "PRAGMA journal_mode=WAL",
+            "PRAGMA synchronous=NORMAL",
+            "PRAGMA temp_store=MEMORY",
+            "PRAGMA cache_size=-262144",
+            "PRAGMA mmap_size=268435456",
+        ]
+        server = getattr(self.client, '_server', self.client)
+        sysdb = getattr(server, '_sysdb', None)
+        if sysdb is None:
+            # ChromaDB 1.x（Rust后端）没有Python层的SQLite连接池
+            return
+        
+        try:
+            conn = sysdb._conn_pool.connect()
+            for pragma in pragmas:
+                conn.execute(pragma)
+            print("✅ 已应用SQLite批量导入优化参数")
+        except Exception as e:
+            print(f"ℹ️ 跳过SQLite参数优化: {e}")
+    
     def process_admission_data(self, admission_data_str: str) -> str:
         """处理录取数据字符串"""
         if not admission_data_str or admission_data_str == 'null':
             return "暂无录取案例数据"
         
+        # 非列表格式直接返回原文，不进入解析
+        if not admission_data_str.lstrip().startswith('['):
+            return f"录取数据: {admission_data_str}"
+        
         try:
-            # 处理字符串格式的列表转换
-            data_str = admission_data_str.replace("'", '"')
-            data_list = json.loads(data_str)
+            # 数据为Python repr格式的列表，直接按字面量解析（可正确处理值中的单引号）
+            data_list = literal_eval(admission_data_str)
             
             cases = []
             for case in data_list:
@@ -73,82 +222,174 @@ class CSProgramsDB:
                 cases.append(case_text)
             
             return " ".join(cases)
-        except (json.JSONDecodeError, TypeError, AttributeError):
+        except (ValueError, SyntaxError, TypeError, AttributeError):
             return f"录取数据: {admission_data_str}"
     
-    def create_document_text(self, row: pd.Series) -> str:
+    def create_document_text(self, row: Dict[str, Any]) -> str:
         """创建用于语义搜索的富文本文档"""
         admission_text = self.process_admission_data(row['admission_data'])
         
-        document = f"""
-项目名称: {row['program_name']}
-所属大学: {row['university']}
-地区: {row['region']}
-项目等级: {row['tier']}
-学制: {row['duration']}
-授课语言: {row['language']}
-学位类型: {row['degree_type']}
-
-项目优点: {row['pros']}
-
-项目缺点: {row['cons']}
-
-招生偏好: {row['admission_preference']}
-
-申请注意事项: {row['application_notes']}
-
-奖学金信息: {row['scholarship']}
-
-过往录取案例: {admission_text}
-
-其他信息: {row['other_info']} {row['other_notes']}
+        return _DOC_TEMPLATE(admission_text=admission_text, **row).strip()
+    
+    @staticmethod
+    def _read_csv_arrow(csv_path: str) -> pd.DataFrame:
+        """
+        使用pyarrow多线程解析CSV，返回Arrow类型支持的DataFrame
+        
+        除数值列外的所有列按字符串读取，空值（含"null"）填充为空字符串，
+        与 pd.read_csv().fillna('') 的结果一致；低基数列做字典编码；
+        保留pd.ArrowDtype，后续字符串操作直接使用Arrow的计算内核。
+        """
+        # 先读表头，为文本列显式指定字符串类型
+        with open(csv_path, encoding='utf-8-sig', newline='') as f:
+            header = next(csv.reader(f), [])
+        column_types = {name: pa.string() for name in header if name not in _NUMERIC_COLUMNS}
+        
+        table = pv.read_csv(
+            csv_path,
+            read_options=pv.ReadOptions(block_size=1 << 20),
+            # 项目优缺点等字段包含换行
+            parse_options=pv.ParseOptions(newlines_in_values=True),
+            convert_options=pv.ConvertOptions(column_types=column_types, strings_can_be_null=True),
+        )
+        
+        columns = []
+        for name, col in zip(table.column_names, table.columns):
+            if name not in _NUMERIC_COLUMNS:
+                col = pc.fill_null(col, '')
+            if name in _CATEGORY_COLUMNS:
+                col = pc.dictionary_encode(col)
+            columns.append(col)
+        table = pa.Table.from_arrays(columns, names=table.column_names)
+        
+        return table.to_pandas(types_mapper=pd.ArrowDtype)
+    
+    def _read_csv_cached(self, csv_path: str) -> pd.DataFrame:
         """
-        return document.strip()
+        读取CSV数据，并在同目录下缓存一份parquet副本
+        
+        缓存文件名带格式版本和CSV内容指纹（与集合名使用同一摘要），解析逻辑或CSV内容变化后
+        旧缓存自动失效，不依赖文件修改时间；命中时直接读取parquet（列式、已带类型，无需再fillna），
+        命中与未命中都返回pd.ArrowDtype列，类型一致。缓存写入失败不影响正常读取。
+        """
+        content_key = self._csv_digest(csv_path).hexdigest()[:12]
+        cache_path = f"{csv_path}.v{_CSV_CACHE_VERSION}.{content_key}.parquet"
+        if os.path.exists(cache_path):
+            print(f"⚡ 使用parquet缓存: {cache_path}")
+            return pd.read_parquet(cache_path, engine='pyarrow', dtype_backend='pyarrow')
+        
+        df = self._read_csv_arrow(csv_path)
+        try:
+            df.to_parquet(cache_path, engine='pyarrow', index=False)
+        except Exception as e:
+            print(f"⚠️ parquet缓存写入失败: {e}")
+        return df
     
     def load_and_process_data(self, csv_path: str = "global_cs_programs.csv") -> tuple:
         """加载和处理CSV数据"""
         if not os.path.exists(csv_path):
             raise FileNotFoundError(f"CSV文件不存在: {csv_path}")
         
-        # 读取CSV数据
-        df = pd.read_csv(csv_path).fillna('')
+        # 读取CSV数据（优先使用parquet缓存）
+        df = self._read_csv_cached(csv_path)
         print(f"📊 读取到 {len(df)} 个CS项目")
         
-        documents = []
-        metadatas = []
-        ids = []
-        
         print("🔄 处理项目数据...")
         
-        for index, row in df.iterrows():
-            # 创建文档文本
-            doc_text = self.create_document_text(row)
-            documents.append(doc_text)
-            
-            # 创建元数据
-            metadata = {
-                'program_name': str(row['program_name']),
-                'university': str(row['university']),
-                'region': str(row['region']),
-                'tier': str(row['tier']),
-                'duration': str(row['duration']),
-                'language': str(row['language']),
-                'degree_type': str(row['degree_type']),
-                'internship_required': True if str(row['internship_required']).strip() == '是' else False,
-                'thesis_required': True if str(row['thesis_required']).strip() == '是' else False,
-                'admission_data_count': int(row['admission_data_count']) if str(row['admission_data_count']).isdigit() else 0
-            }
-            metadatas.append(metadata)
-            
-            # 创建唯一ID
-            ids.append(f"program_{index}")
+        # 创建文档文本（转为普通dict，避免iterrows逐行构造Series）
+        documents = [self.create_document_text(row) for row in df.to_dict(orient='records')]
+        
+        # 创建元数据（按列向量化计算，再一次性转为records）
+        meta_df = df[['program_name', 'university', 'region', 'tier',
+                      'duration', 'language', 'degree_type']].astype(str)
+        meta_df['internship_required'] = df['internship_required'].astype(str).str.strip().eq('是')
+        meta_df['thesis_required'] = df['thesis_required'].astype(str).str.strip().eq('是')
+        meta_df['admission_data_count'] = (
+            pd.to_numeric(df['admission_data_count'], errors='coerce').fillna(0).astype('int32')
+        )
+        metadatas = meta_df.to_dict(orient='records')
+        
+        # 创建唯一ID
+        ids = [f"program_{i}" for i in range(len(df))]
         
         print(f"✅ 成功处理 {len(documents)} 个项目")
         return documents, metadatas, ids
     
+    def _csv_digest(self, csv_path: str) -> "hashlib._Hash":
+        """计算CSV文件内容的sha256摘要，供集合名和parquet缓存名共用"""
+        if not os.path.exists(csv_path):
+            raise FileNotFoundError(f"CSV文件不存在: {csv_path}")
+        
+        digest = hashlib.sha256()
+        with open(csv_path, 'rb') as f:
+            digest.update(f.read())
+        return digest
+    
+    def _dataset_key(self, csv_path: str) -> str:
+        """根据CSV内容和嵌入函数计算数据指纹，任一变化都会得到新的集合名"""
+        digest = self._csv_digest(csv_path)
+        digest.update(type(self.embedding_function).__name__.encode())
+        return digest.hexdigest()[:12]
+    
+    def use_dataset(self, csv_path: str = "global_cs_programs.csv") -> str:
+        """
+        将集合名绑定到数据指纹（前缀_哈希）
+        
+        数据和嵌入函数未变化时集合名不变，可直接复用已构建的集合，跳过嵌入计算和索引重建。
+        """
+        self.collection_name = f"{self.collection_prefix}_{self._dataset_key(csv_path)}"
+        print(f"🔑 数据集合名: {self.collection_name}")
+        return self.collection_name
+    
+    def _get_max_batch_size(self) -> int:
+        """获取客户端允许的单次add最大条数，旧版本ChromaDB不支持时返回0"""
+        try:
+            return int(self.client.get_max_batch_size())
+        except Exception:
+            return 0
+    
+    def _embed_documents(self, documents: List[str], embed_batch_size: int = 64) -> np.ndarray:
+        """一次性计算全部文档的嵌入向量，按子批次调用模型以控制内存，返回 (N, d) float32 矩阵"""
+        chunks = [
+            np.asarray(self.embedding_function(documents[i:i+embed_batch_size]), dtype=np.float32)
+            for i in range(0, len(documents), embed_batch_size)
+        ]
+        if not chunks:
+            # 无文档时用一次探测调用确定维度，保证返回 (0, d) 而不是 (0, 0)
+            dim = len(self.embedding_function([""])[0])
+            return np.empty((0, dim), dtype=np.float32)
+        return np.vstack(chunks)
+    
+    def _open_collection(self) -> None:
+        """获取或创建集合；HNSW参数只在新建时传入，复用已有集合时保持其创建时的参数"""
+        # 集合将被替换，旧的int8快照不再有效
+        self.int8_index = None
+        try:
+            self.collection = self.client.get_collection(
+                name=self.collection_name,
+                embedding_function=self.embedding_function
+            )
+        except Exception:
+            self.collection = self.client.create_collection(
+                name=self.collection_name,
+                embedding_function=self.embedding_function,
+                metadata=_HNSW_METADATA
+            )
+    
     def create_collection(self, documents: List[str], metadatas: List[Dict], ids: List[str], 
-                         recreate: bool = True) -> None:
-        """创建或重新创建集合"""
+                         recreate: bool = True, batch_size: int = 200) -> None:
+        """
+        创建集合并添加数据；recreate=False 时，已完整包含全部项目的集合直接复用，
+        项目数不一致（如上次导入中断）的集合会被重建
+        
+        Args:
+            documents: 文档文本列表
+            metadatas: 元数据列表
+            ids: 唯一ID列表
+            recreate: 是否删除已有集合后重建；配合 use_dataset 的哈希集合名时可设为False
+            batch_size: 每批添加的项目数，推荐100-250；add的开销主要按调用次数计算，
+                过小的批次会放大SQLite和嵌入流程的固定开销
+        """
         
         # 删除现有集合（如果存在且需要重新创建）
         if recreate:
@@ -158,42 +399,77 @@ class CSProgramsDB:
             except:
                 print(f"ℹ️ 集合 {self.collection_name} 不存在，将创建新集合")
         
-        # 创建新集合
-        self.collection = self.client.create_collection(
-            name=self.collection_name,
-            embedding_function=self.embedding_function
-        )
+        self._open_collection()
+        
+        existing_count = self.collection.count()
+        if existing_count and existing_count == len(ids):
+            print(f"✅ 集合 {self.collection_name} 已包含全部 {existing_count} 个项目，跳过重建")
+            return
+        if existing_count:
+            # 上次导入未完成（批次失败或进程中断），数据不完整，删除后重建
+            print(f"⚠️ 集合 {self.collection_name} 仅包含 {existing_count}/{len(ids)} 个项目，重新构建")
+            self.client.delete_collection(name=self.collection_name)
+            self._open_collection()
         print(f"✅ 创建集合: {self.collection_name}")
         
-        # 批量添加数据
-        batch_size = 10
+        if not documents:
+            # 无数据可写，跳过嵌入计算和Arrow暂存（空FixedSizeList无法构建）
+            print("🎉 集合创建完成，包含 0 个项目")
+            return
+        
+        # 批量添加数据（不超过客户端允许的最大批次）
+        max_batch_size = self._get_max_batch_size()
+        if max_batch_size:
+            batch_size = min(batch_size, max_batch_size)
         total_batches = (len(documents) + batch_size - 1) // batch_size
         
+        # 预先批量计算嵌入，避免每个add批次单独调用模型
+        print(f"🧮 计算 {len(documents)} 个文档的嵌入向量...")
+        embeddings = self._embed_documents(documents)
+        
+        # 中间数据存为Arrow表：嵌入列为FixedSizeList，直接引用embeddings矩阵的内存，
+        # 上传期间需保持embeddings存活
+        dim = embeddings.shape[1]
+        table = pa.table({
+            'id': pa.array(ids, type=pa.string()),
+            'document': pa.array(documents, type=pa.string()),
+            'embedding': pa.FixedSizeListArray.from_arrays(pa.array(embeddings.ravel()), dim),
+        })
+        
         print(f"📦 分 {total_batches} 批次添加数据，每批 {batch_size} 个项目")
         
+        # 写入在当前线程进行，先为当前线程的SQLite连接应用批量导入参数
+        self._apply_sqlite_pragmas()
+        
+        # 嵌入已预先计算，逐批顺序写入即可；同一集合的并行写入只会在写路径上互相竞争
+        added = 0
         for i in range(0, len(documents), batch_size):
-            batch_docs = documents[i:i+batch_size]
-            batch_ids = ids[i:i+batch_size]
-            batch_metadata = metadatas[i:i+batch_size]
-            
             batch_num = (i // batch_size) + 1
+            batch_table = table.slice(i, batch_size)
+            # 切片后的嵌入列按偏移展开为numpy视图，不经过tolist
+            batch_embeddings = batch_table.column('embedding').chunk(0).flatten().to_numpy()
             
             try:
                 self.collection.add(
-                    documents=batch_docs,
-                    metadatas=batch_metadata,
-                    ids=batch_ids
+                    documents=batch_table.column('document').to_pylist(),
+                    embeddings=batch_embeddings.reshape(-1, dim),
+                    metadatas=metadatas[i:i+batch_size],
+                    ids=batch_table.column('id').to_pylist()
                 )
+                added += batch_table.num_rows
                 print(f"✅ 批次 {batch_num}/{total_batches} 添加成功")
                 
             except Exception as e:
                 print(f"❌ 批次 {batch_num} 添加失败: {str(e)}")
                 break
         
-        print(f"🎉 集合创建完成，包含 {self.collection.count()} 个项目")
+        # 使用本地计数，避免额外的COUNT(*)查询
+        print(f"🎉 集合创建完成，包含 {added} 个项目")
     
     def get_existing_collection(self) -> bool:
         """获取现有集合"""
+        # 集合将被替换，旧的int8快照不再有效
+        self.int8_index = None
         try:
             self.collection = self.client.get_collection(
                 name=self.collection_name,
@@ -216,7 +492,7 @@ class CSProgramsDB:
         
         try:
             results = self.collection.query(
-                query_texts=[query_text],
+                query_embeddings=[self._embed_query(query_text)],
                 n_results=n_results,
                 where=where_filter
             )
@@ -225,21 +501,116 @@ class CSProgramsDB:
             print(f"❌ 查询失败: {e}")
             return {}
     
-    def print_query_results(self, results: Dict[str, Any], query_description: str = ""):
+    @staticmethod
+    def _quantize_int8(embeddings: np.ndarray, scale: float = None) -> tuple:
+        """对称标量量化为int8，返回 (int8矩阵, 缩放系数)；未给定scale时按数据最大绝对值校准"""
+        if scale is None:
+            # 空输入没有可校准的最大值
+            scale = float(np.abs(embeddings).max()) / 127 if embeddings.size else 0.0
+            scale = scale or 1.0
+        quantized = np.clip(np.rint(embeddings / scale), -127, 127).astype(np.int8)
+        return quantized, scale
+    
+    def build_int8_index(self) -> None:
+        """
+        从集合中取出全部向量并量化为int8，构建内存中的暴力扫描索引
+        
+        ChromaDB内部始终以float32存储向量，int8矩阵仅用于 scan_programs，
+        内存占用约为原向量的1/4。集合数据变化后需重新调用。
+        """
+        if not self.collection:
+            raise ValueError("集合未初始化，请先创建或连接到集合")
+        
+        all_data = self.collection.get(include=['embeddings', 'documents', 'metadatas'])
+        embeddings = np.asarray(all_data['embeddings'], dtype=np.float32)
+        if embeddings.size == 0:
+            embeddings = embeddings.reshape(0, 0)
+        vectors, scale = self._quantize_int8(embeddings)
+        self.int8_index = {
+            'ids': all_data['ids'],
+            'documents': all_data['documents'],
+            'metadatas': all_data['metadatas'],
+            'vectors': vectors,
+            'scale': scale,
+        }
+        print(f"✅ 构建int8索引: {vectors.shape[0]} 个向量, {vectors.nbytes / 1024:.1f} KB")
+    
+    def scan_programs(self, query_text: str, n_results: int = 5) -> Dict[str, Any]:
+        """
+        基于int8索引的暴力扫描查询（不支持where过滤）
+        
+        默认嵌入模型输出单位向量，内积即余弦相似度；返回结构与 query_programs 一致，
+        可直接传给 print_query_results。
+        """
+        if self.int8_index is None:
+            self.build_int8_index()
+        
+        index = self.int8_index
+        if index['vectors'].shape[0] == 0:
+            return {'ids': [[]], 'documents': [[]], 'metadatas': [[]], 'distances': [[]]}
+        
+        query = np.asarray(self._embed_query(query_text), dtype=np.float32)
+        query_q, query_scale = self._quantize_int8(query)
+        
+        # int32累加避免溢出，再还原为浮点相似度
+        scores = index['vectors'].astype(np.int32) @ query_q.astype(np.int32)
+        similarities = scores * (index['scale'] * query_scale)
+        
+        top = np.argsort(-similarities)[:n_results]
+        
+        return {
+            'ids': [[index['ids'][i] for i in top]],
+            'documents': [[index['documents'][i] for i in top]],
+            'metadatas': [[index['metadatas'][i] for i in top]],
+            'distances': [[float(1 - similarities[i]) for i in top]],
+        }
+    
+    def query_programs_batch(self, query_texts: List[str], n_results: int = 5,
+                             where_filter: Dict = None) -> Dict[str, Any]:
+        """批量查询：多条查询文本共用一次检索调用（未缓存的文本合并为一次嵌入计算），结果按输入顺序排列"""
+        if not self.collection:
+            raise ValueError("集合未初始化，请先创建或连接到集合")
+        
+        try:
+            return self.collection.query(
+                query_embeddings=self._embed_queries(query_texts),
+                n_results=n_results,
+                where=where_filter
+            )
+        except Exception as e:
+            print(f"❌ 查询失败: {e}")
+            return {}
+    
+    def run_queries(self, configs: List[Dict[str, Any]]) -> None:
+        """
+        按配置执行并打印一组查询
+        
+        每个配置包含 description、query_text，可选 n_results（默认5）和 where_filter；
+        所有查询文本先合并为一次嵌入计算写入缓存，再按各自的过滤条件检索。
+        """
+        self._embed_queries([config['query_text'] for config in configs])
+        
+        for config in configs:
+            results = self.query_programs(
+                query_text=config['query_text'],
+                n_results=config.get('n_results', 5),
+                where_filter=config.get('where_filter')
+            )
+            self.print_query_results(results, config['description'])
+    
+    def print_query_results(self, results: Dict[str, Any], query_description: str = "",
+                            query_index: int = 0):
         """打印查询结果"""
-        if not results or not results.get('documents') or not results['documents'][0]:
+        if not results or not results.get('documents') or not results['documents'][query_index]:
             print(f"\n🤷 {query_description} - 未找到符合条件的结果")
             return
         
         print(f"\n🔍 {query_description}")
         print("=" * 50)
         
-        for i, (doc, metadata, distance) in enumerate(zip(
-            results['documents'][0],
-            results['metadatas'][0],
-            results['distances'][0]
-        )):
-            print(f"\n📋 结果 {i+1} (相似度: {1-distance:.3f}):")
+        for result in _iter_results(results, query_index):
+            metadata = result.metadata
+            print(f"\n📋 结果 {result.rank} (相似度: {result.similarity:.3f}):")
             print(f"  项目: {metadata.get('program_name', 'N/A')}")
             print(f"  大学: {metadata.get('university', 'N/A')}")
             print(f"  地区: {metadata.get('region', 'N/A')}")
@@ -255,38 +626,66 @@ class CSProgramsDB:
             print("❌ 集合未初始化")
             return
         
-        all_data = self.collection.get()
+        all_data = self.collection.get(include=['metadatas'])
         total_count = len(all_data['metadatas'])
         
         print(f"\n📊 集合统计信息")
         print("=" * 30)
         print(f"总项目数: {total_count}")
         
-        # 按地区统计
-        regions = [meta['region'] for meta in all_data['metadatas']]
-        region_counts = {}
-        for region in regions:
-            region_counts[region] = region_counts.get(region, 0) + 1
+        # 将元数据按字段转为numpy数组，再按列聚合
+        metas = all_data['metadatas']
+        regions = np.asarray([meta['region'] for meta in metas], dtype=str)
+        tiers = np.asarray([meta['tier'] for meta in metas], dtype=str)
+        
+        region_values, region_freqs = np.unique(regions, return_counts=True)
+        region_counts = dict(zip(region_values.tolist(), region_freqs.tolist()))
+        tier_values, tier_freqs = np.unique(tiers, return_counts=True)
+        tier_counts = dict(zip(tier_values.tolist(), tier_freqs.tolist()))
+        thesis_required = int(np.fromiter((meta['thesis_required'] for meta in metas),
+                                          dtype=bool, count=total_count).sum())
         
         print(f"\n📍 按地区分布:")
         for region, count in sorted(region_counts.items()):
             print(f"  {region}: {count} 个项目")
         
-        # 按等级统计
-        tiers = [meta['tier'] for meta in all_data['metadatas']]
-        tier_counts = {}
-        for tier in tiers:
-            tier_counts[tier] = tier_counts.get(tier, 0) + 1
-        
         print(f"\n🏆 按等级分布:")
         for tier, count in sorted(tier_counts.items()):
             print(f"  {tier}: {count} 个项目")
         
         # 论文要求统计
-        thesis_required = sum(1 for meta in all_data['metadatas'] if meta['thesis_required'])
         print(f"\n📝 需要论文的项目: {thesis_required}/{total_count}")
 
 
+# 示例查询配置
+EXAMPLE_QUERIES = [
+    {
+        "description": "短学制项目 (1年以内)",
+        "query_text": "学制短 快速毕业 时间紧凑",
+        "n_results": 5,
+        "where_filter": {"duration": {"$in": ["9个月", "10个月", "11个月", "12个月", "1年", "一年"]}},
+    },
+    {
+        "description": "顶级项目 (T0/T1)",
+        "query_text": "顶级大学 计算机科学 人工智能",
+        "n_results": 5,
+        "where_filter": {"tier": {"$in": ["T0", "T1"]}},
+    },
+    {
+        "description": "英国CS项目",
+        "query_text": "英国 录取友好 申请建议",
+        "n_results": 3,
+        "where_filter": {"region": "英国"},
+    },
+    {
+        "description": "不需要论文的项目",
+        "query_text": "不需要论文 coursework 授课型",
+        "n_results": 3,
+        "where_filter": {"thesis_required": False},
+    },
+]
+
+
 def main():
     """主函数 - 演示用法"""
     print("🚀 CS Programs ChromaDB Query Tool (默认嵌入模型)")
@@ -295,24 +694,26 @@ def main():
     # 初始化数据库
     db = CSProgramsDB()
     
-    # 尝试连接现有集合
-    if not db.get_existing_collection():
-        print("\n🔄 未找到现有集合，开始创建新集合...")
+    # 按数据指纹确定集合名，数据未变化时直接复用
+    try:
+        db.use_dataset()
+    except FileNotFoundError as e:
+        print(f"❌ {e}")
+        print("请确保 'global_cs_programs.csv' 文件在当前目录下")
+        return
+    
+    # 加载数据并连接集合：集合完整时直接复用，不存在或不完整时（重新）构建
+    try:
+        documents, metadatas, ids = db.load_and_process_data()
+        db.create_collection(documents, metadatas, ids, recreate=False)
         
-        # 加载和处理数据
-        try:
-            documents, metadatas, ids = db.load_and_process_data()
-            
-            # 创建集合
-            db.create_collection(documents, metadatas, ids)
-            
-        except FileNotFoundError as e:
-            print(f"❌ {e}")
-            print("请确保 'global_cs_programs.csv' 文件在当前目录下")
-            return
-        except Exception as e:
-            print(f"❌ 数据处理失败: {e}")
-            return
+    except FileNotFoundError as e:
+        print(f"❌ {e}")
+        print("请确保 'global_cs_programs.csv' 文件在当前目录下")
+        return
+    except Exception as e:
+        print(f"❌ 数据处理失败: {e}")
+        return
     
     # 显示统计信息
     db.get_collection_stats()
@@ -321,41 +722,11 @@ def main():
     print(f"\n🔍 执行示例查询")
     print("=" * 40)
     
-    # 查询1: 短学制项目
-    results1 = db.query_programs(
-        query_text="学制短 快速毕业 时间紧凑",
-        n_results=5,
-        where_filter={"duration": {"$in": ["9个月", "10个月", "11个月", "12个月", "1年", "一年"]}}
-    )
-    db.print_query_results(results1, "短学制项目 (1年以内)")
-    
-    # 查询2: 顶级项目
-    results2 = db.query_programs(
-        query_text="顶级大学 计算机科学 人工智能",
-        n_results=5,
-        where_filter={"tier": {"$in": ["T0", "T1"]}}
-    )
-    db.print_query_results(results2, "顶级项目 (T0/T1)")
-    
-    # 查询3: 英国项目
-    results3 = db.query_programs(
-        query_text="英国 录取友好 申请建议",
-        n_results=3,
-        where_filter={"region": "英国"}
-    )
-    db.print_query_results(results3, "英国CS项目")
-    
-    # 查询4: 不需要论文的项目
-    results4 = db.query_programs(
-        query_text="不需要论文 coursework 授课型",
-        n_results=3,
-        where_filter={"thesis_required": False}
-    )
-    db.print_query_results(results4, "不需要论文的项目")
+    db.run_queries(EXAMPLE_QUERIES)
     
     print(f"\n✅ 查询演示完成!")
     print(f"\n💡 使用提示:")
-    print("- 可以修改 main() 函数中的查询来测试不同搜索")
+    print("- 可以修改 EXAMPLE_QUERIES 中的查询来测试不同搜索")
     print("- 支持中文和英文查询")
     print("- 可以使用 where_filter 进行精确筛选")
     print("- 默认嵌入模型无需API密钥，但效果可能不如专业模型")
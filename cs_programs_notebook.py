@@ -4,7 +4,8 @@ import polars as pl
 import chromadb
 import chromadb.utils.embedding_functions as embedding_functions
 from pprint import pprint
-import json
+from ast import literal_eval
+from dataclasses import dataclass
 import re
 
 print("Libraries imported successfully!")
@@ -36,10 +37,13 @@ def process_admission_data(admission_data_str):
     if not admission_data_str or admission_data_str == 'null':
         return "暂无录取案例数据"
     
+    # Non-list values are returned as-is without parsing
+    if not admission_data_str.lstrip().startswith('['):
+        return f"录取数据: {admission_data_str}"
+    
     try:
-        # Handle string format list conversion
-        data_str = admission_data_str.replace("'", "\"")
-        data_list = json.loads(data_str)
+        # The column holds Python-repr'd lists; parse them literally so apostrophes in values survive
+        data_list = literal_eval(admission_data_str)
         
         cases = []
         for case in data_list:
@@ -53,7 +57,7 @@ def process_admission_data(admission_data_str):
             cases.append(case_text)
         
         return " ".join(cases)
-    except (json.JSONDecodeError, TypeError, AttributeError):
+    except (ValueError, SyntaxError, TypeError, AttributeError):
         return f"录取数据: {admission_data_str}"
 
 def create_document_text(row):
@@ -94,7 +98,13 @@ ids = []
 
 print(f"Processing {len(df)} CS programs...")
 
-for index, row in df.iterrows():
+# Parse numeric/flag columns once per column; tolist() yields plain Python int/bool for metadata
+admission_counts = pd.to_numeric(df['admission_data_count'], errors='coerce').fillna(0).astype('int32').tolist()
+internship_flags = df['internship_required'].astype(str).str.strip().eq('是').tolist()
+thesis_flags = df['thesis_required'].astype(str).str.strip().eq('是').tolist()
+
+# Iterate plain dict records instead of building a pd.Series per row
+for index, row in enumerate(df.to_dict(orient='records')):
     # Create document text
     doc_text = create_document_text(row)
     documents.append(doc_text)
@@ -108,9 +118,9 @@ for index, row in df.iterrows():
         'duration': str(row['duration']),
         'language': str(row['language']),
         'degree_type': str(row['degree_type']),
-        'internship_required': True if str(row['internship_required']).strip() == '是' else False,
-        'thesis_required': True if str(row['thesis_required']).strip() == '是' else False,
-        'admission_data_count': int(row['admission_data_count']) if str(row['admission_data_count']).isdigit() else 0
+        'internship_required': internship_flags[index],
+        'thesis_required': thesis_flags[index],
+        'admission_data_count': admission_counts[index]
     }
     metadatas.append(metadata)
     
@@ -167,6 +177,53 @@ for i in range(0, len(documents), batch_size):
 print(f"\nCollection created with {collection.count()} programs")
 
 # Cell 8: Test semantic search queries with filters
+# Shared result printing for the query cells below
+FIELD_LABELS = {
+    'program_name': '项目',
+    'university': '大学',
+    'region': '地区',
+    'tier': '等级',
+    'duration': '学制',
+    'language': '语言',
+    'degree_type': '学位类型',
+    'admission_data_count': '录取案例数',
+}
+
+@dataclass
+class QueryResult:
+    """A single ranked hit from a collection.query result"""
+    __slots__ = ('rank', 'document', 'metadata', 'distance')
+
+    rank: int
+    document: str
+    metadata: dict
+    distance: float
+
+    @property
+    def similarity(self):
+        return 1 - self.distance
+
+def iter_results(results, query_index=0):
+    """Yield QueryResult records for one query of a collection.query result"""
+    for rank, (doc, metadata, distance) in enumerate(zip(
+        results['documents'][query_index],
+        results['metadatas'][query_index],
+        results['distances'][query_index]
+    ), start=1):
+        yield QueryResult(rank, doc, metadata, distance)
+
+def print_results(title, results, fields, query_index=0, show_similarity=False):
+    """Print the selected metadata fields of every result under a title"""
+    print(f"\n{title}")
+    for result in iter_results(results, query_index):
+        suffix = f" (相似度: {result.similarity:.3f})" if show_similarity else ""
+        print(f"\n📋 Result {result.rank}{suffix}:")
+        for field in fields:
+            if field == 'thesis_required':
+                print(f"是否需要论文: {'是' if result.metadata['thesis_required'] else '否'}")
+            else:
+                print(f"{FIELD_LABELS[field]}: {result.metadata[field]}")
+
 print("\n=== Testing Semantic Search with Filters ===")
 
 # Query 1: Find TOP-TIER programs suitable for mainland Chinese students
@@ -176,19 +233,11 @@ results1 = collection.query(
     where={"$and": [{"tier": {"$in": ["T0", "T1"]}}, {"admission_data_count": {"$gt": 0}}]}
 )
 
-print("\n🔍 Query: 'T0/T1级别且有陆本录取案例的项目'")
-for i, (doc, metadata, distance) in enumerate(zip(
-    results1['documents'][0], 
-    results1['metadatas'][0], 
-    results1['distances'][0]
-)):
-    print(f"\n📋 Result {i+1} (相似度: {1-distance:.3f}):")
-    print(f"项目: {metadata['program_name']}")
-    print(f"大学: {metadata['university']}")
-    print(f"地区: {metadata['region']}")
-    print(f"等级: {metadata['tier']}")
-    print(f"学制: {metadata['duration']}")
-    print(f"录取案例数: {metadata['admission_data_count']}")
+print_results(
+    "🔍 Query: 'T0/T1级别且有陆本录取案例的项目'", results1,
+    ['program_name', 'university', 'region', 'tier', 'duration', 'admission_data_count'],
+    show_similarity=True
+)
 
 # Cell 9: More targeted queries with duration filter
 # Query 2: Short duration programs (filter for programs ≤ 12 months)
@@ -198,18 +247,10 @@ results2 = collection.query(
     where={"duration": {"$in": ["9个月", "10个月", "11个月", "12个月", "1年", "一年"]}}
 )
 
-print("\n🔍 Query: '1年以内的短学制优质项目'")
-for i, (doc, metadata, distance) in enumerate(zip(
-    results2['documents'][0], 
-    results2['metadatas'][0], 
-    results2['distances'][0]
-)):
-    print(f"\n📋 Result {i+1}:")
-    print(f"项目: {metadata['program_name']}")
-    print(f"学制: {metadata['duration']}")
-    print(f"大学: {metadata['university']}")
-    print(f"等级: {metadata['tier']}")
-    print(f"地区: {metadata['region']}")
+print_results(
+    "🔍 Query: '1年以内的短学制优质项目'", results2,
+    ['program_name', 'duration', 'university', 'tier', 'region']
+)
 
 # Query 3: Scholarship opportunities (exclude programs with "较难获得" scholarships)
 results3 = collection.query(
@@ -217,17 +258,10 @@ results3 = collection.query(
     n_results=5
 )
 
-print("\n🔍 Query: '有奖学金机会的优质项目'")
-for i, (doc, metadata, distance) in enumerate(zip(
-    results3['documents'][0], 
-    results3['metadatas'][0], 
-    results3['distances'][0]
-)):
-    print(f"\n📋 Result {i+1}:")
-    print(f"项目: {metadata['program_name']}")
-    print(f"大学: {metadata['university']}")
-    print(f"地区: {metadata['region']}")
-    print(f"等级: {metadata['tier']}")
+print_results(
+    "🔍 Query: '有奖学金机会的优质项目'", results3,
+    ['program_name', 'university', 'region', 'tier']
+)
 
 # Cell 10: Advanced filtering with metadata
 print("\n=== Advanced Filtering ===")
@@ -246,29 +280,15 @@ us_programs = collection.query(
     where={"$and": [{"region": "英国"}, {"admission_data_count": {"$gt": 0}}]}
 )
 
-print("\n🎯 Filter: 英国T0级别项目")
-for i, (doc, metadata, distance) in enumerate(zip(
-    uk_t0_results['documents'][0], 
-    uk_t0_results['metadatas'][0], 
-    uk_t0_results['distances'][0]
-)):
-    print(f"\n📋 Result {i+1}:")
-    print(f"项目: {metadata['program_name']}")
-    print(f"大学: {metadata['university']}")
-    print(f"学位类型: {metadata['degree_type']}")
-    print(f"是否需要论文: {'是' if metadata['thesis_required'] else '否'}")
-
-print("\n🎯 Filter: 英国有录取数据的项目")
-for i, (doc, metadata, distance) in enumerate(zip(
-    us_programs['documents'][0], 
-    us_programs['metadatas'][0], 
-    us_programs['distances'][0]
-)):
-    print(f"\n📋 Result {i+1}:")
-    print(f"项目: {metadata['program_name']}")
-    print(f"大学: {metadata['university']}")
-    print(f"等级: {metadata['tier']}")
-    print(f"录取案例数: {metadata['admission_data_count']}")
+print_results(
+    "🎯 Filter: 英国T0级别项目", uk_t0_results,
+    ['program_name', 'university', 'degree_type', 'thesis_required']
+)
+
+print_results(
+    "🎯 Filter: 英国有录取数据的项目", us_programs,
+    ['program_name', 'university', 'tier', 'admission_data_count']
+)
 
 # Cell 11: Specialized queries for different needs
 print("\n=== Specialized Queries ===")
@@ -280,17 +300,10 @@ no_thesis_programs = collection.query(
     where={"$and": [{"thesis_required": False}, {"tier": {"$in": ["T0", "T1"]}}]}
 )
 
-print("\n🎯 不需要论文的顶级项目:")
-for i, (doc, metadata, distance) in enumerate(zip(
-    no_thesis_programs['documents'][0], 
-    no_thesis_programs['metadatas'][0], 
-    no_thesis_programs['distances'][0]
-)):
-    print(f"\n📋 Result {i+1}:")
-    print(f"项目: {metadata['program_name']}")
-    print(f"大学: {metadata['university']}")
-    print(f"学制: {metadata['duration']}")
-    print(f"等级: {metadata['tier']}")
+print_results(
+    "🎯 不需要论文的顶级项目:", no_thesis_programs,
+    ['program_name', 'university', 'duration', 'tier']
+)
 
 # Query for English-taught programs in non-English countries
 non_english_countries = collection.query(
@@ -302,17 +315,10 @@ non_english_countries = collection.query(
     ]}
 )
 
-print("\n🎯 非英语国家的英语授课项目:")
-for i, (doc, metadata, distance) in enumerate(zip(
-    non_english_countries['documents'][0], 
-    non_english_countries['metadatas'][0], 
-    non_english_countries['distances'][0]
-)):
-    print(f"\n📋 Result {i+1}:")
-    print(f"项目: {metadata['program_name']}")
-    print(f"大学: {metadata['university']}")
-    print(f"地区: {metadata['region']}")
-    print(f"语言: {metadata['language']}")
+print_results(
+    "🎯 非英语国家的英语授课项目:", non_english_countries,
+    ['program_name', 'university', 'region', 'language']
+)
 
 # Cell 12: Collection statistics and analysis
 print("\n=== Collection Statistics ===")